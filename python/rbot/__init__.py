@@ -2,6 +2,8 @@ from .rbot import *
 import pandas as pd
 import numpy as np
 import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
 if hasattr(rbot, "__all__"):
     __all__ = rbot.__all__
@@ -16,23 +18,43 @@ def decode_order_side(bs):
         return "ERROR"
 
 
+def compact_df(df, columns):
+    # 価格・サイズ列をfloat32へダウンキャストしてメモリを節約する。
+    for c in columns:
+        df[c] = pd.to_numeric(df[c], downcast='float')
+
+    return df
+
+
+def _to_column_dict(array, columns):
+    # Rust側からは行優先(C-order)の2次元配列が渡される。
+    # 列ごとの1次元配列に分解してからDataFrameを作ると
+    # 各列がcontiguousになり、列方向の集計(min/max/mean等)が速い。
+    array = np.asarray(array).reshape(-1, len(columns))
+
+    return {c: np.ascontiguousarray(array[:, i]) for i, c in enumerate(columns)}
+
+
 def trades_to_df(array):
     df = pd.DataFrame(
-        array, columns=["timestamp", "price", "size", "side"])
+        _to_column_dict(array, ["timestamp", "price", "size", "side"]))
     df['timestamp'] = pd.to_datetime(
         (df["timestamp"]), utc=True, unit='us')
     df = df.set_index('timestamp')
 
     df['side'] = df['side'].map(decode_order_side)
 
+    df = compact_df(df, ["price", "size"])
+
     return df
 
 
 def ohlcvv_to_df(array):
     df = pd.DataFrame(
-        array, columns=["timestamp", "side", "open", "high", "low", "close", "volume",
-                        #                        "count",
-                        "start_time", "end_time"])
+        _to_column_dict(array,
+                        ["timestamp", "side", "open", "high", "low", "close", "volume",
+                         #                        "count",
+                         "start_time", "end_time"]))
     df['timestamp'] = pd.to_datetime(
         (df["timestamp"]), utc=True, unit='us')
     df = df.set_index('timestamp')
@@ -45,86 +67,45 @@ def ohlcvv_to_df(array):
 
     df['side'] = df['side'].map(decode_order_side)
 
+    df = compact_df(df, ["open", "high", "low", "close", "volume"])
+
     return df
 
 
 def ohlcv_to_df(array):
     df = pd.DataFrame(
-        array, columns=["timestamp", "open", "high", "low", "close", "volume",
-                        #                "count"
-                        ])
+        _to_column_dict(array,
+                        ["timestamp", "open", "high", "low", "close", "volume",
+                         #                "count"
+                         ]))
 
     df['timestamp'] = pd.to_datetime(
         (df["timestamp"]), utc=True, unit='us')
     df = df.set_index('timestamp')
 
+    df = compact_df(df, ["open", "high", "low", "close", "volume"])
+
     return df
 
 
 def result_to_df(result_list):
-    update_time = []
-    order_id = []
-    order_sub_id = []
-    order_side = []
-    post_only = []
-    create_time = []
-    status = []
-    open_price = []
-    open_home_size = []
-    open_foreign_size = []
-    close_price = []
-    close_home_size = []
-    close_foreign_size = []
-    order_price = []
-    order_home_size = []
-    order_foreign_size = []
-    profit = []
-    fee = []
-    total_profit = []
-    position_change = []
-    message = []
-
-    for item in result_list:
-        update_time.append(item.update_time)
-        order_id.append(item.order_id)
-        order_sub_id.append(item.order_sub_id)
-        order_side.append(str(item.order_side))
-        post_only.append(item.post_only)
-        create_time.append(item.create_time)
-        status.append(str(item.status))
-        open_price.append(item.open_price)
-        open_home_size.append(item.open_home_size)
-        open_foreign_size.append(item.open_foreign_size)
-        close_price.append(item.close_price)
-        close_home_size.append(item.close_home_size)
-        close_foreign_size.append(item.close_foreign_size)
-        order_price.append(item.order_price)
-        order_home_size.append(item.order_home_size)
-        order_foreign_size.append(item.order_foreign_size)
-        profit.append(item.profit)
-        fee.append(item.fee)
-        total_profit.append(item.total_profit)
-        position_change.append(item.position_change)
-        message.append(item.message)
-
+    # OrderResult.to_dict()はRust側で全フィールドを一度に辞書化する。
+    # （レコード毎に属性アクセス20回超のFFI往復を１回にまとめる）
     df = pd.DataFrame(
-        data={"update_time": update_time, "order_id": order_id, "sub_id": order_sub_id,
-              "order_side": order_side,
-              # "post_only": post_only,
-              "create_time": create_time,
-              "status":  status,
-              "open_price": open_price, "open_size": open_home_size, "open_volume": open_foreign_size,
-              "close_price": close_price, "close_size": close_home_size, "close_volume": close_foreign_size,
-              "order_price": order_price, "order_size": order_home_size, "order_volume": order_foreign_size,
-              "profit": profit, "fee": fee,
-              "total_profit": total_profit, "position_change": position_change, "message": message},
-        columns=["update_time", "order_id", "sub_id", "order_side",
+        [item.to_dict() for item in result_list],
+        columns=["update_time", "order_id", "order_sub_id", "order_side",
                  # "post_only",
                  "create_time", "status",
-                 "open_price", "open_size", "open_volume",
-                 "close_price", "close_size", "close_volume",
-                 "order_price", "order_size", "order_volume",
+                 "open_price", "open_home_size", "open_foreign_size",
+                 "close_price", "close_home_size", "close_foreign_size",
+                 "order_price", "order_home_size", "order_foreign_size",
                  "profit", "fee", "total_profit", "position_change", "message"])
+
+    df = df.rename(
+        columns={"order_sub_id": "sub_id",
+                 "open_home_size": "open_size", "open_foreign_size": "open_volume",
+                 "close_home_size": "close_size", "close_foreign_size": "close_volume",
+                 "order_home_size": "order_size", "order_foreign_size": "order_volume"})
     df["update_time"] = pd.to_datetime(
         (df["update_time"]), utc=True, unit="us")
     df["create_time"] = pd.to_datetime(
@@ -140,6 +121,24 @@ def result_to_df(result_list):
 class BaseAgent:
     def __init__(self):
         self._indicators = {}
+        self._ohlcv_cache = {}
+
+    def cached_ohlcv(self, session, time_window, num_of_bars):
+        # バーの開始時刻が進むまで前回のohlcvを使い回す。
+        # clock_intervalがtime_windowより短いAgentでは大半のon_clockで
+        # DBの再集計を省略できる。
+        # （未確定足もバー内ではキャッシュされたままになる点に注意）
+        bar_start = session.current_timestamp // (time_window * 1_000_000)
+
+        key = (time_window, num_of_bars)
+        cached = self._ohlcv_cache.get(key)
+        if cached is not None and cached[0] == bar_start:
+            return cached[1]
+
+        df = session.ohlcv(time_window, num_of_bars)
+        self._ohlcv_cache[key] = (bar_start, df)
+
+        return df
 
     def key_in_indicators(self, key):
         if key in self._indicators:
@@ -245,6 +244,7 @@ class Session:
 class Market:
     MARKET = {}
     DUMMY_MODE = True
+    _DOWNLOADED_NDAYS = {}
 
     @classmethod
     def dummy_mode(cls, dummy=True):
@@ -271,9 +271,26 @@ class Market:
 
     @classmethod
     def download(cls, ndays, force=False):
-        for m in cls.MARKET:
-            cls.MARKET[m].download(ndays, force)
-            cls.MARKET[m].vaccum()
+        # 過去日のアーカイブは不変なので、同一プロセス内で既に
+        # ndays分をカバー済みのmarketは再ダウンロードしない。
+        if force:
+            targets = dict(cls.MARKET)
+        else:
+            targets = {key: m for key, m in cls.MARKET.items()
+                       if cls._DOWNLOADED_NDAYS.get(key, -1) < ndays}
+
+        if not targets:
+            return
+
+        # ダウンロードはネットワークI/O待ちが支配的（Rust側はGILを解放する）
+        # なので、market毎に並列で行う。
+        with ThreadPoolExecutor(max_workers=len(targets)) as pool:
+            list(pool.map(lambda m: m.download(ndays, force), targets.values()))
+
+        for key, m in targets.items():
+            m.vaccum()
+            cls._DOWNLOADED_NDAYS[key] = max(
+                ndays, cls._DOWNLOADED_NDAYS.get(key, -1))
 
     @classmethod
     def vaccum():
@@ -281,12 +298,18 @@ class Market:
             cls.MARKET[m].vaccum()
 
     @classmethod
-    def _cache_data(cls):
+    def cache_data(cls):
+        # 登録済みmarketのトレード／OHLCVキャッシュを先読みする。
+        # 同一セッションで複数回バックテストする場合、最初に一度呼んでおくと
+        # 以降のohlcv/select_tradesはDBを見ずにキャッシュから返る。
         for m in cls.MARKET:
             cls.MARKET[m].cache_all_data()
 
     @staticmethod
+    @lru_cache(maxsize=256)
     def key(exchange, market):
+        # 同じ(exchange, market)の組でopen/downloadの度に呼ばれるので
+        # upper()と文字列連結の結果をメモ化しておく。
         return exchange.upper() + "/" + market.upper()
 
 
@@ -403,6 +426,11 @@ class BinanceMarket:
     def select_trades(self, from_time, to_time):
         return trades_to_df(self.market.select_trades(from_time, to_time))
 
+    def select_trades_array(self, from_time, to_time):
+        # DataFrameを組み立てずRust側のnumpy配列（timestamp, price, size, side列）を
+        # そのまま返す。件数カウントや列単位のmin/max/sum程度ならこちらが軽い。
+        return self.market.select_trades(from_time, to_time)
+
     def ohlcvv(self, from_time, to_time, window_sec):
         return ohlcvv_to_df(self.market.ohlcvv(from_time, to_time, window_sec))
 
@@ -1,5 +1,7 @@
 // Copyright(c) 2022. yasstake. All rights reserved.
 
+use std::sync::Once;
+
 use pyo3::pyfunction;
 use log::{LevelFilter};
 use simple_logger::SimpleLogger;
@@ -7,14 +9,21 @@ use simple_logger::SimpleLogger;
 pub mod time;
 pub mod order;
 
+// loggerはプロセスで１回しか登録できない。２回目以降の呼び出しは無視する。
+static INIT_LOGGER: Once = Once::new();
+
 #[pyfunction]
 pub fn init_log() {
-    let _ = SimpleLogger::new().with_level(LevelFilter::Warn).init();
+    INIT_LOGGER.call_once(|| {
+        let _ = SimpleLogger::new().with_level(LevelFilter::Warn).init();
+    });
 }
 
 #[pyfunction]
 pub fn init_debug_log() {
-    let _ = SimpleLogger::new().with_level(LevelFilter::Debug).init();
+    INIT_LOGGER.call_once(|| {
+        let _ = SimpleLogger::new().with_level(LevelFilter::Debug).init();
+    });
 }
 
 #[cfg(test)]
@@ -124,7 +124,8 @@ impl TradeTable {
             param = vec![from_time];
         }
 
-        let mut statement = self.connection.prepare(sql).unwrap();
+        // 同じSQLの再パースを避けるため、コネクションのstatementキャッシュを使う。
+        let mut statement = self.connection.prepare_cached(sql).unwrap();
 
         let start_time = NOW();
 
@@ -320,7 +321,10 @@ impl TradeTable {
     ) -> DataFrame {
         self.update_cache_df(from_time, to_time);
 
-        if time_window_sec % TradeTable::OHLCV_WINDOW_SEC == 0 {
+        if time_window_sec == TradeTable::OHLCV_WINDOW_SEC {
+            // キャッシュ自体が60秒足。再集計せず切り出すだけでよい。
+            select_df(&self.cache_ohlcvv, from_time, to_time)
+        } else if time_window_sec % TradeTable::OHLCV_WINDOW_SEC == 0 {
             ohlcvv_from_ohlcvv_df(&self.cache_ohlcvv, from_time, to_time, time_window_sec)
         } else {
             ohlcvv_df(&self.cache_df, from_time, to_time, time_window_sec)
@@ -452,7 +456,8 @@ impl TradeTable {
     pub fn select_array(&mut self, from_time: MicroSec, to_time: MicroSec) -> ndarray::Array2<f64> {
         self.update_cache_df(from_time, to_time);
 
-        let trades = self.select_df_from_db(from_time, to_time);
+        // update_cache_dfで該当区間はキャッシュ済み。DBを二度舐めせずキャッシュから切り出す。
+        let trades = select_df(&self.cache_df, from_time, to_time);
 
         let array: ndarray::Array2<f64> = trades
             .select(&[KEY::time_stamp, KEY::price, KEY::size, KEY::order_side])
@@ -728,17 +733,18 @@ impl TradeTable {
         let sql = r#"insert or replace into trades (time_stamp, action, price, size, id)
                                 values (?1, ?2, ?3, ?4, ?5) "#;
 
+        // tx.execute()はレコード毎にSQLを再パースする。
+        // 一度だけprepareして同じstatementへバインドし直す。
+        let mut statement = tx.prepare_cached(sql)?;
+
         for rec in trades {
-            let result = tx.execute(
-                sql,
-                params![
-                    rec.time,
-                    rec.order_side.to_string(),
-                    rec.price,
-                    rec.size,
-                    rec.id
-                ],
-            );
+            let result = statement.execute(params![
+                rec.time,
+                rec.order_side.to_string(),
+                rec.price,
+                rec.size,
+                rec.id
+            ]);
 
             match result {
                 Ok(size) => {
@@ -751,6 +757,8 @@ impl TradeTable {
             }
         }
 
+        drop(statement);
+
         let result = tx.commit();
 
         match result {
@@ -17,9 +17,9 @@ use crate::common::time::{time_string, DAYS};
 use crate::common::time::{to_naive_datetime, MicroSec};
 use crate::common::time::{NOW};
 use crate::db::sqlite::TradeTable;
-use crate::fs::db_full_path;
+use crate::fs::{archive_directory, db_full_path};
 
-use super::{log_download};
+use super::{log_download, prefetch_logs};
 
 #[derive(Debug)]
 #[pyclass(name = "_BinanceMarket")]
@@ -55,7 +55,13 @@ impl BinanceMarket {
         self.db.reset_cache_duration();
     }
 
-    pub fn download(&mut self, ndays: i64, force: bool) -> i64 {
+    pub fn download(&mut self, py: Python, ndays: i64, force: bool) -> i64 {
+        // ダウンロード中はPythonオブジェクトに触らないのでGILを解放する。
+        // （Python側で複数marketのダウンロードを並列に走らせられる）
+        py.allow_threads(|| self._download(ndays, force))
+    }
+
+    fn _download(&mut self, ndays: i64, force: bool) -> i64 {
         let (tx, rx): (Sender<Vec<Trade>>, Receiver<Vec<Trade>>) = mpsc::channel();
 
         let mut download_rec: i64 = 0;
@@ -103,13 +109,19 @@ impl BinanceMarket {
             urls.push(self.make_historical_data_url_timestamp(day));
         }
 
+        let archive_dir = archive_directory("BN");
+
         let _handle = thread::spawn(move || {
+            // 先に全日分を並列でキャッシュへ落とす。
+            // 以降のlog_downloadはキャッシュヒットとなり展開のみになる。
+            prefetch_logs(&urls, &archive_dir);
+
             for url in urls {
                 log::debug!("download url = {}", url);
 
                 let mut buffer: Vec<Trade> = vec![];
 
-                let result = log_download(url.as_str(), false, |rec| {
+                let result = log_download(url.as_str(), &archive_dir, false, |rec| {
                     let trade = BinanceMarket::rec_to_trade(&rec);
 
                     buffer.push(trade);
@@ -144,7 +156,6 @@ impl BinanceMarket {
                 match result {
                     Ok(count) => {
                         log::debug!("Downloaded rec = {} ", count);
-                        println!("Downloaded rec = {} ", count);                        
                         download_rec += count;
                     },
                     Err(e) => {
@@ -327,7 +338,7 @@ mod binance_test {
         println!("{}", time_string(market.db.start_time().unwrap_or(0)));
         println!("{}", time_string(market.db.end_time().unwrap_or(0)));        
         println!("Let's donwload");
-        market.download(2, false);
+        market._download(2, false);
     }
 
     #[test]
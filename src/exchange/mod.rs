@@ -6,18 +6,38 @@ pub mod binance;
 
 use std::{
     fs::File,
-    io::{copy, Write, BufReader, Cursor},
+    io::{Write, BufReader, BufWriter},
     path::Path,
+    sync::OnceLock,
+    time::Duration,
 };
 
 use csv::{self, StringRecord};
 use flate2::bufread::GzDecoder;
-use tempfile::tempdir;
+use tempfile::tempdir_in;
 use tokio::runtime::Runtime;
 use zip::ZipArchive;
 
+// HTTPクライアントとランタイムはプロセスで共有する。
+// （コネクションプールが使い回され、アーカイブ毎のTCP/TLSハンドシェイクが省ける）
+static DOWNLOAD_RUNTIME: OnceLock<Runtime> = OnceLock::new();
+static HTTP_CLIENT: OnceLock<reqwest::Client> = OnceLock::new();
+
+fn download_runtime() -> &'static Runtime {
+    DOWNLOAD_RUNTIME.get_or_init(|| Runtime::new().expect("cannot create tokio runtime"))
+}
+
+fn http_client() -> &'static reqwest::Client {
+    HTTP_CLIENT.get_or_init(|| {
+        reqwest::Client::builder()
+            .tcp_keepalive(Some(Duration::from_secs(60)))
+            .build()
+            .expect("cannot create http client")
+    })
+}
+
 pub async fn log_download_tmp(url: &str, tmp_dir: &Path) -> Result<String, String> {
-    let response = match reqwest::get(url).await {
+    let mut response = match http_client().get(url).send().await {
         Ok(r) => r,
         Err(e) => {
             log::error!("URL get error {}", e.to_string());
@@ -25,6 +45,13 @@ pub async fn log_download_tmp(url: &str, tmp_dir: &Path) -> Result<String, Strin
         }
     };
 
+    // 404（未公開・上場廃止）やレート制限などのエラーページを
+    // アーカイブとして保存してしまわないよう、ステータスを確認する。
+    if response.status().is_success() == false {
+        log::error!("HTTP status error {} [{}]", response.status(), url);
+        return Err(format!("HTTP status error {} [{}]", response.status(), url));
+    }
+
     let fname = response
         .url()
         .path_segments()
@@ -34,48 +61,130 @@ pub async fn log_download_tmp(url: &str, tmp_dir: &Path) -> Result<String, Strin
 
     let fname = tmp_dir.join(fname);
 
-    let mut target = match File::create(&fname) {
+    let target = match File::create(&fname) {
         Ok(t) => t,
         Err(e) => {return Err(e.to_string());}
     };
 
     let file_name = fname.to_str().unwrap();
-    let content = match response.bytes().await {
-        Ok(c) => c,
-        Err(e) => {
-            log::error!("{}", e.to_string());
-            return Err(e.to_string());
-        }
-    };
-    let mut cursor = Cursor::new(content);
 
-    if copy(&mut cursor, &mut target).is_err() {
-       return Err(format!("write error"));
+    // 全体をメモリにためず、受信したチャンク毎にバッファ経由で書き出す。
+    // （ディスク書き込みとネットワーク受信がオーバラップする）
+    let mut writer = BufWriter::new(&target);
+
+    loop {
+        match response.chunk().await {
+            Ok(Some(chunk)) => {
+                if writer.write_all(&chunk).is_err() {
+                    return Err(format!("write error"));
+                }
+            }
+            Ok(None) => {
+                break;
+            }
+            Err(e) => {
+                log::error!("{}", e.to_string());
+                return Err(e.to_string());
+            }
+        }
     }
 
-    let _r = target.flush();
+    let _r = writer.flush();
+    drop(writer);
 
     log::debug!("download size {}", target.metadata().unwrap().len());
 
     Ok(file_name.to_string())
 }
 
-pub fn log_download<F>(url: &str, has_header: bool, f: F) -> Result<i64, String>
+/// 複数URLのアーカイブをまとめてキャッシュへ先読みする。
+/// ダウンロードだけを並列化し（最大4本）、後続のlog_downloadはキャッシュヒットになる。
+pub fn prefetch_logs(urls: &[String], cache_dir: &Path) {
+    use futures::stream::{self, StreamExt};
+
+    let targets: Vec<String> = urls
+        .iter()
+        .filter(|url| {
+            let file_name = url.rsplit('/').next().unwrap_or("");
+            file_name.is_empty() || !cache_dir.join(file_name).exists()
+        })
+        .cloned()
+        .collect();
+
+    if targets.is_empty() {
+        return;
+    }
+
+    let rt = download_runtime();
+
+    rt.block_on(async {
+        stream::iter(targets)
+            .for_each_concurrent(4, |url| async move {
+                let file_name = match url.rsplit('/').next().filter(|name| !name.is_empty()) {
+                    Some(name) => name.to_string(),
+                    None => {
+                        return;
+                    }
+                };
+
+                let tmp_dir = match tempdir_in(cache_dir) {
+                    Ok(tmp) => tmp,
+                    Err(e) => {
+                        log::error!("create tmp dir error {}", e.to_string());
+                        return;
+                    }
+                };
+
+                match log_download_tmp(url.as_str(), tmp_dir.path()).await {
+                    Ok(file_path) => {
+                        let cache_path = cache_dir.join(&file_name);
+                        if std::fs::rename(&file_path, &cache_path).is_err() {
+                            log::error!("cannot store cache {:?}", cache_path);
+                        }
+                    }
+                    Err(e) => {
+                        log::error!("prefetch error {} {}", url, e);
+                    }
+                }
+            })
+            .await;
+    });
+}
+
+pub fn log_download<F>(url: &str, cache_dir: &Path, has_header: bool, mut f: F) -> Result<i64, String>
 where
     F: FnMut(&StringRecord),
 {
-    log::debug!("Downloading ...[{}]", url);
-    println!("Downloading ...[{}]", url);    
+    let file_name = url
+        .rsplit('/')
+        .next()
+        .filter(|name| !name.is_empty())
+        .unwrap_or("tmp.bin");
 
-    let rt = match Runtime::new() {
-        Ok(r) => r,
-        Err(e) => {
-            log::error!("runtie create error {}", e.to_string());
-            return Err(e.to_string());
+    let cache_path = cache_dir.join(file_name);
+
+    // キャッシュ済みアーカイブがあればダウンロードせずに展開する。
+    if cache_path.exists() {
+        log::debug!("archive cache hit {:?}", cache_path);
+        match extract_log(url, &cache_path.to_str().unwrap().to_string(), has_header, &mut f) {
+            Ok(count) => {
+                return Ok(count);
+            }
+            Err(e) => {
+                // 展開できないキャッシュは壊れているので捨てて、ダウンロードし直す。
+                log::warn!("broken cache {:?} ({}), re-downloading", cache_path, e);
+                let _r = std::fs::remove_file(&cache_path);
+            }
         }
-    };
+    }
+
+    log::debug!("Downloading ...[{}]", url);
+
+    let rt = download_runtime();
 
-    let tmp_dir = match tempdir() {
+    // キャッシュと同じファイルシステム上に作ってrenameで確定させる。
+    // （途中で失敗したダウンロードをキャッシュに残さないため）
+    let tmp_dir = match tempdir_in(cache_dir) {
         Ok(tmp) => tmp,
         Err(e) => {
             log::error!("create tmp dir error {}", e.to_string());
@@ -95,20 +204,33 @@ where
         }
     }
 
+    // 展開に成功したものだけをキャッシュへ昇格させる。
+    // （壊れたアーカイブを以降の実行がキャッシュヒットしないように）
+    let rec_count = extract_log(url, &file_path, has_header, f)?;
+
+    if std::fs::rename(&file_path, &cache_path).is_err() {
+        return Err(format!("cannot store cache {:?}", cache_path));
+    }
+
+    Ok(rec_count)
+}
+
+fn extract_log<F>(url: &str, file_path: &String, has_header: bool, f: F) -> Result<i64, String>
+where
+    F: FnMut(&StringRecord),
+{
     log::debug!("let's extract = {}", file_path);
-   
+
     if url.ends_with("gz") || url.ends_with("GZ") {
         // TODO: implmeent extract gzip file.
 //        return gzip_log_download(response, has_header, f);
         return Ok(0);
     } else if url.ends_with("zip") || url.ends_with("ZIP") {
-        return extract_zip_log(&file_path, has_header, f);    
+        return extract_zip_log(file_path, has_header, f);
     } else {
         log::error!("unknown file suffix {}", url);
         return Err(format!("").to_string());
     }
-
-    // remove tmp file
 }
 
 
@@ -249,6 +371,7 @@ where
 mod test_exchange {
     use super::*;
     use crate::common::init_debug_log;
+    use tempfile::tempdir;
 
     #[test]
     fn test_log_download() {
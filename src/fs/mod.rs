@@ -25,6 +25,18 @@ pub fn db_full_path(exchange_name: &str, spot_future_type: &str, market_type: &s
 }
 
 
+/// ダウンロード済みアーカイブ（日次ログ）のキャッシュ置き場。
+/// 過去日のアーカイブは不変なので、一度落としたファイルは使い回せる。
+pub fn archive_directory(exchange_name: &str) -> PathBuf {
+    let project_dir = project_dir();
+    let archive_dir = project_dir.join("ARCHIVE");
+    let exchange_dir = archive_dir.join(exchange_name);
+    let _ = fs::create_dir_all(&exchange_dir);
+
+    return exchange_dir;
+}
+
+
 #[cfg(test)]
 mod test_fs {
     use super::*;
@@ -43,4 +55,11 @@ mod test_fs {
 
         println!("{:?}", db);
     }
+
+    #[test]
+    fn test_archive_directory() {
+        let dir = archive_directory("BN");
+
+        println!("{:?}", dir);
+    }
 }
\ No newline at end of file
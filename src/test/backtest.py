@@ -17,7 +17,6 @@ import tracemalloc
 import objgraph
 
 rbot.init_log()
-rbot.init_debug_log()
 
 class Agent(BaseAgent):   
     def __init__(self):
@@ -68,7 +67,6 @@ class Agent(BaseAgent):
     #    print(str(result))
     #    pass
 
-rbot.init_debug_log()
 binance = Market.open("BN", "BTCBUSD")
 print(binance.info())
 Market.download(10)
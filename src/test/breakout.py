@@ -19,6 +19,8 @@ class BreakOutAgent(BaseAgent):
             """ super().__init()__ で上位クラスの初期化を必ずすること　"""
             super().__init__()
             self.param_K = param_K  # パラメターKを設定する。
+            self._bar_cache_key = None   # numpy配列化した足をバー単位で使い回すためのキャッシュ
+            self._bar_cache = None
 
     def clock_interval(self):
         """ on_clockが呼び出される間隔を秒で返す。今回は10分毎(600秒)にする"""
@@ -33,21 +35,32 @@ class BreakOutAgent(BaseAgent):
         if session.short_order_size or session.long_order_size:
             return 
         
-        ############   メインロジック  ###################### 
-        ohlcv_df = session.ohlcv(60*60*2, 6)  # 2時間足(60*60*2sec)を６本取得。 最新は６番目。ただし未確定足
-        if len(ohlcv_df.index) < 6:           # データが過去６本分そろっていない場合はなにもせずリターン
-            return 
-
-        ohlcv5 = ohlcv_df[:-2]       # 過去５本足（確定）
-        range_width = (ohlcv5['high'] - ohlcv5['low']).mean() * self.param_K  # 価格変動レンジの平均を計算 * K
-
-        # Long/Short判定
-        ohlcv_latest = ohlcv_df[-2:-1]     # 最新足１本(未確定)        
-        diff_low   =   (ohlcv_latest['open'][0] - ohlcv_latest['low'][0])
-        detect_short  = range_width < diff_low
-
-        diff_high  = - (ohlcv_latest['open'][0] - ohlcv_latest['high'][0])  
-        detect_long = range_width  < diff_high
+        ############   メインロジック  ######################
+        bar_key = time_us // (60 * 60 * 2 * 1_000_000)
+        if bar_key == self._bar_cache_key:
+            # 同じバー内はnumpy配列化済みの足とレンジ幅をそのまま使い回す
+            high, low, open_, range_width = self._bar_cache
+        else:
+            ohlcv_df = self.cached_ohlcv(session, 60*60*2, 6)  # 2時間足(60*60*2sec)を６本取得。 最新は６番目。ただし未確定足
+            if len(ohlcv_df.index) < 6:       # データが過去６本分そろっていない場合はなにもせずリターン
+                return
+
+            # pandasの中間Seriesを作らずnumpy配列で直接計算する（on_clock毎に呼ばれるホットパス）
+            high = ohlcv_df['high'].to_numpy()
+            low = ohlcv_df['low'].to_numpy()
+            open_ = ohlcv_df['open'].to_numpy()
+
+            range_width = (high[:-2] - low[:-2]).mean() * self.param_K  # 過去５本足（確定）の価格変動レンジの平均 * K
+
+            self._bar_cache_key = bar_key
+            self._bar_cache = (high, low, open_, range_width)
+
+        # Long/Short判定（最新足１本(未確定)を利用）
+        diff_low = open_[-2] - low[-2]
+        detect_short = range_width < diff_low
+
+        diff_high = high[-2] - open_[-2]
+        detect_long = range_width < diff_high
         
         ##########  メインロジック中に利用したindicatorのロギング（あとでグラフ化するため保存）    ##############
         self.log_indicator('diff_low', time_us, diff_low)